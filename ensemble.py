@@ -7,13 +7,34 @@ from utils import DebuggablePipeLine
 from sklearn.calibration import CalibratedClassifierCV
 from itertools import chain, repeat, count, islice
 from collections import Counter
-def build_ensemble_path(models, path):
+from scoring import predict_proba
+
+def build_ensemble_path(models, path, compile_trees=False, X_check=None):
     ensemble = []
     for m in models:
         ensemble.append((m, load(path+f"{m}.joblib")))
+    if compile_trees:
+        if X_check is None:
+            raise ValueError("compile_trees=True needs X_check to verify the compiled members")
+        ensemble = compile_ensemble(ensemble, X_check)
     
     return ensemble
 
+
+def compile_ensemble(ensemble, X_check):
+    """Replace the tree-based members with their compiled version (see tree_compiler.py).
+
+    The compiled members are verified against the original predict_proba on
+    X_check (e.g. the test split), the others are kept as they are.
+    """
+    # imported here: importing ensemble should not pull in xgboost
+    from tree_compiler import compile_tree_pipeline
+    compiled_ensemble = []
+    for name, model in ensemble:
+        compiled = compile_tree_pipeline(model, X_check)
+        compiled_ensemble.append((name, compiled if compiled is not None else model))
+    return compiled_ensemble
+
 def build_ensemble(models):
     ensemble = []
     for name,model in models:
@@ -22,19 +43,28 @@ def build_ensemble(models):
     return ensemble
 
 
-def predict_ensemble(ensemble, X, y, threshold=0.5):
-    y_proba = []
-    for m in ensemble:
-        # Do a cast only if you want to see your data transformed
-        #m = DebuggablePipeLine.cast(m)
-        y_proba.append(m.predict_proba(X))
-    y_proba = np.mean(y_proba, axis=0)
+def predict_ensemble(ensemble, X, y, threshold=0.5, weights=None, n_jobs=None, return_timings=False):
+    """Average the members' probabilities, optionally weighted (see scoring.predict_proba).
+
+    With `n_jobs` > 1 (or negative as in joblib, -1 for all cores) the
+    members predict concurrently on a thread pool. With `return_timings=True` the predict_proba time of
+    every member is also returned.
+    """
+    # Do a cast only if you want to see your data transformed
+    #ensemble = [DebuggablePipeLine.cast(m) for m in ensemble]
+    y_proba, timings = predict_proba(ensemble, X, weights, n_jobs=n_jobs, return_timings=True)
     y_pred = y_proba[:, 1] > threshold
+    if return_timings:
+        return y_proba, y_pred, timings
     return y_proba, y_pred
 
 
-def evaluate_ensemble(ensemble, X, y, threshold=0.5, verbose=True):
-    y_proba, y_pred = predict_ensemble(ensemble, X, y)
+def evaluate_ensemble(ensemble, X, y, threshold=0.5, verbose=True, weights=None, n_jobs=None):
+    y_proba, y_pred = predict_ensemble(ensemble, X, y, weights=weights, n_jobs=n_jobs)
+    return score_ensemble_proba(y_proba, y_pred, y, verbose)
+
+
+def score_ensemble_proba(y_proba, y_pred, y, verbose=True):
     if verbose:
         print(classification_report(y, y_pred, digits=3))
         print(f"auroc {roc_auc_score(y, y_proba[:, 1]):.3f}")
@@ -59,6 +89,37 @@ def find_best_ensemble(models_list, path, X_training, y_training ,  X_valid, y_v
             tmp = [_m for _, _m in ensemble]
             acc = evaluate_ensemble(tmp, X_valid, y_valid, verbose= verbose)
             results.append((combine_name, tmp, acc))
+    return rank_ensembles(results)
+
+
+def find_best_ensemble_oof(proba, y, threshold=0.5, verbose = False):
+    """Same search as find_best_ensemble, but on cached probabilities.
+
+    `proba` is a DataFrame with one column of positive-class probabilities
+    per model (see oof.load_oof_store), so no pipeline is loaded. The second
+    element of every result is the list of model names.
+    """
+    complete = ~proba.isna().any(axis=1).to_numpy()
+    if not complete.all():
+        print(f"Ignoring {np.count_nonzero(~complete)} rows without a probability for every model")
+        proba, y = proba[complete], np.asarray(y)[complete]
+    if len(proba) == 0:
+        raise ValueError("No row has a probability for every model")
+    names_list = list(proba.columns)
+    columns = proba.to_numpy()
+    results = []
+    for key in range(2,len(names_list)):
+        for combine in unique_combinations(range(len(names_list)), key):
+            combine_name = [names_list[i] for i in combine]
+            y_pos = columns[:, list(combine)].mean(axis=1)
+            y_proba = np.column_stack((1 - y_pos, y_pos))
+            acc = score_ensemble_proba(y_proba, y_pos > threshold, y, verbose= verbose)
+            results.append((combine_name, combine_name, acc))
+    return rank_ensembles(results)
+
+
+def rank_ensembles(results):
+    """Keep the 5 best ensembles by brier score plus the 5 best by f1 macro."""
     results.sort(key=lambda item:item[2][2])
     results = results[:5]
     copy = results.copy()
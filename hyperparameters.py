@@ -1,64 +1,115 @@
 import scipy.stats as stats
+from sklearn.model_selection import ParameterSampler
+
+# Every model maps to a list of sub-spaces (RandomizedSearchCV picks a sub-space, then samples it).
+# A parameter only appears in the sub-spaces where it is valid, this is how the dependencies
+# between parameters are declared (e.g. degree only with poly).
+# Sub-spaces are picked uniformly, so there is one sub-space per solver / kernel / booster:
+# every choice keeps the share of candidates it had in the original flat space.
+lr_common = {
+    'model__C': stats.randint(1, 10), #default is 1, if the value is larger, then it indicates stronger regularization
+    'model__max_iter': stats.randint(100, 5000), # Default is 100, Maximum number of iterations taken for the solvers to converge.
+}
+svc_common = {
+    'model__C': stats.randint(100, 600),
+    'model__gamma': ['scale', 'auto'], #Kernel coefficient for ‘rbf’, ‘poly’ and ‘sigmoid’. scale = 1 / (n_features * X.var()) as value of gamma,
+    'model__max_iter': [400, 800, 1200, 1600]
+}
+nn_common = {
+    'model__hidden_layer_sizes': [[stats.randint.rvs(100, 300), stats.randint.rvs(50, 150)], [stats.randint.rvs(50, 300)]],
+    'model__learning_rate_init': stats.uniform(0.0005, 0.005),
+    'model__alpha': stats.uniform(0, 1), #Strength of the L2 regularization term
+    'model__early_stopping': [True],
+    'model__max_iter': stats.randint(300, 500),
+}
+xgb_common = {
+    'model__eta': stats.uniform(0.05, 0.5),
+    'model__n_estimators': stats.randint(10, 100),
+    'model__lambda': stats.uniform(0.5, 1.5),     # L2 regularization
+    'model__alpha': stats.uniform(0, 0.5),        # L1 regularization
+    'model__scale_pos_weight': [0.2, 0.4, 0.8, 1, 2],
+}
+xgb_tree = {
+    'model__gamma': stats.uniform(0, 0.2),
+    'model__max_depth': [2, 3, 4, 6],
+    'model__subsample': [0.25, 0.5, 0.75, 1],     # Stochastic regularization
+}
+
 hyperparameters = {
-    "lr" :{
-        'model__penalty': ['l1', 'l2', 'elasticnet'], #type of penalities added, 'elasticnet' means both
-        'model__dual': [True, False], # use primal or dual form. Default is True.  
-        'model__warm_start': [True, False], # default is False. When set to True, reuse the solution of the previous call to fit as initialization, otherwise, just erase the previous solution. 
-        'model__C': stats.randint(1, 10), #default is 1, if the value is larger, then it indicates stronger regularization
-        'model__max_iter': stats.randint(100, 5000), # Default is 100, Maximum number of iterations taken for the solvers to converge.
-        'model__solver': ['newton-cg', 'lbfgs', 'liblinear', 'sag', 'saga'] #default is lbfgs. 
-    },
-    "svc" :{
-        'model__C': stats.randint(100, 600),
-        'model__kernel': ['rbf', 'poly', 'sigmoid'],
-        'model__degree': stats.randint(5, 200),
-        'model__gamma': ['scale', 'auto'], #Kernel coefficient for ‘rbf’, ‘poly’ and ‘sigmoid’. scale = 1 / (n_features * X.var()) as value of gamma,
-        'model__coef0': stats.uniform(0.0, 1), # It is only significant in ‘poly’ and ‘sigmoid’.
-        'model__max_iter': [400, 800, 1200, 1600]
-    },
-    "knn" :{
+    # warm_start is not searched: the search always fits a fresh clone, so it has no effect
+    "lr" :[
+        # l2 only solvers, primal form only
+        {**lr_common, 'model__solver': ['newton-cg'], 'model__penalty': ['l2'], 'model__dual': [False]},
+        {**lr_common, 'model__solver': ['lbfgs'], 'model__penalty': ['l2'], 'model__dual': [False]},
+        {**lr_common, 'model__solver': ['sag'], 'model__penalty': ['l2'], 'model__dual': [False]},
+        # primal only: the dual form (l2 only) solves the same problem
+        {**lr_common, 'model__solver': ['liblinear'], 'model__penalty': ['l1', 'l2'], 'model__dual': [False]},
+        # saga is the only solver for elasticnet, l1_ratio from 0 (l2) to 1 (l1) also covers the pure penalties
+        {**lr_common, 'model__solver': ['saga'], 'model__penalty': ['elasticnet'], 'model__dual': [False],
+         'model__l1_ratio': stats.uniform(0, 1)},
+    ],
+    "svc" :[
+        {**svc_common, 'model__kernel': ['rbf']},
+        {**svc_common, 'model__kernel': ['sigmoid'],
+         'model__coef0': stats.uniform(0.0, 1)}, # It is only significant in ‘poly’ and ‘sigmoid’.
+        {**svc_common, 'model__kernel': ['poly'],
+         'model__degree': stats.randint(2, 6), # only used by ‘poly’, higher degrees give non-finite dual coefficients
+         'model__coef0': stats.uniform(0.0, 1)},
+    ],
+    "knn" :[{
         'model__n_neighbors': stats.randint(2, 100),
         'model__weights': ('uniform', 'distance'), # ‘distance’ : weight points by the inverse of their distance. in this case, closer neighbors of a query point will have a greater influence than neighbors which are further away.
         'model__algorithm': ('ball_tree', 'kd_tree'),
         'model__leaf_size': stats.randint(10, 60)
-    },
-    "rf" :{
+    }],
+    "rf" :[{
         'model__n_estimators': stats.randint(10, 200),
         'model__criterion': ('gini', 'entropy'), # The function to measure the quality of a split. Tree-specific parameter
-        'model__min_samples_split': stats.randint(1, 8), #The minimum number of samples required to split an internal node
+        'model__min_samples_split': stats.randint(2, 8), #The minimum number of samples required to split an internal node, must be at least 2
         'model__min_samples_leaf': stats.randint(1, 5), # The minimum number of samples required to be at a leaf node
         'model__max_features': ('sqrt', 'log2', None), # If “sqrt”, then max_features=sqrt(n_features). If “log2”, then max_features=log2(n_features), If None, then max_features=n_features.
-        'model__class_weight': ['balanced', 'balanced_subsample'], 
-    },
-    "adaboost" :{
+        'model__class_weight': ['balanced', 'balanced_subsample'],
+    }],
+    "adaboost" :[{
         'model__n_estimators': stats.randint(10, 100),
         'model__learning_rate': stats.uniform(0.2, 1)
-    },
-    "nn" :{
-        'model__hidden_layer_sizes': [[stats.randint.rvs(100, 300), stats.randint.rvs(50, 150)], [stats.randint.rvs(50, 300)]], 
-        'model__solver': ['sgd', 'adam'], #sgd’ refers to stochastic gradient descent. ‘adam’ refers to a stochastic gradient-based optimizer
-        'model__learning_rate_init': stats.uniform(0.0005, 0.005), 
-        'model__learning_rate': ('constant', 'adaptive'), 
-        'model__alpha': stats.uniform(0, 1), #Strength of the L2 regularization term
-        'model__early_stopping': [True],
-        'model__max_iter': stats.randint(300, 500),
-    },
-    "gb" :{
+    }],
+    "nn" :[
+        # learning_rate (the schedule) is only used by sgd
+        {**nn_common, 'model__solver': ['sgd'], 'model__learning_rate': ('constant', 'adaptive')},
+        {**nn_common, 'model__solver': ['adam']}, #sgd’ refers to stochastic gradient descent. ‘adam’ refers to a stochastic gradient-based optimizer
+    ],
+    "gb" :[{
         'model__learning_rate': stats.uniform(0.03, 0.2),
         'model__n_estimators': stats.randint(10, 100),
         'model__max_depth': stats.randint(2, 6),
         'model__max_features': ('sqrt', 'log2', None),  # regularization
         'model__subsample': (0.25, 0.5, 0.75, 1),       # regularization
-    },
-    "xgb" :{
-        'model__booster': ['gbtree', 'gblinear', 'dart'],
-        'model__eta': stats.uniform(0.05, 0.5),
-        'model__gamma': stats.uniform(0, 0.2),
-        'model__max_depth': [2, 3, 4, 6],
-        'model__n_estimators': stats.randint(10, 100),
-        'model__subsample': [0.25, 0.5, 0.75, 1],     # Stochastic regularization
-        'model__lambda': stats.uniform(0.5, 1.5),     # L2 regularization
-        'model__alpha': stats.uniform(0, 0.5),        # L1 regularization
-        'model__scale_pos_weight': [0.2, 0.4, 0.8, 1, 2],
-    }
-}
\ No newline at end of file
+    }],
+    "xgb" :[
+        # tree boosters
+        {**xgb_common, **xgb_tree, 'model__booster': ['gbtree']},
+        {**xgb_common, **xgb_tree, 'model__booster': ['dart']},
+        # linear booster, the tree parameters do not apply
+        {**xgb_common, 'model__booster': ['gblinear']},
+    ]
+}
+
+
+def unique_candidates(space, n_iter=5000, random_state=None, digits=4, verbose=True):
+    """Sample `n_iter` configurations from `space` and drop the duplicates.
+
+    Continuous values are compared on `digits` significant digits (so small
+    ranges such as learning_rate_init are not collapsed), the sampled values
+    are kept as they are. The result is a list of single-valued sub-spaces,
+    RandomizedSearchCV then evaluates each of them exactly once (train.train
+    calls it on its `hyperparams`).
+    """
+    seen = {}
+    for params in ParameterSampler(space, n_iter=n_iter, random_state=random_state):
+        key = {k: float(f"{v:.{digits}g}") if isinstance(v, float) else v for k, v in params.items()}
+        seen.setdefault(repr(sorted(key.items())), params)
+    candidates = [{k: [v] for k, v in params.items()} for params in seen.values()]
+    if verbose:
+        print(f"Unique candidates: {len(candidates)} out of {n_iter} sampled")
+    return candidates
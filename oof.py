@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+
+# Out-of-fold / validation probability store written by train.train_and_evaluate.
+# One file per split, one column per model plus the target, indexed by patient Number.
+
+def oof_store_path(path_oof, split):
+    return f"{path_oof}oof_{split}.csv"
+
+
+def update_oof_store(path_oof, split, name, ids, y, proba):
+    """Add (or replace) the positive-class probabilities of `name` in the store."""
+    if ids is None or not len(ids) == len(y) == len(proba):
+        raise ValueError(f"{name}: one patient id per probability is needed to update the {split} store")
+    file_path = oof_store_path(path_oof, split)
+    column = pd.Series(proba, index=pd.Index(ids, name="Number"), name=name)
+    if os.path.isfile(file_path):
+        store = pd.read_csv(file_path, index_col=0)
+        store = store.reindex(store.index.union(column.index))
+    else:
+        store = pd.DataFrame(index=column.index)
+    store.loc[column.index, "y"] = y
+    store[name] = column
+    store.index.name = "Number"
+    store.to_csv(file_path, float_format="%.6f")
+    return store
+
+
+def load_oof_store(path_oof, split, models=None):
+    """Return (probabilities, y) for the stored models, optionally a subset of them.
+
+    Models stored from different row sets leave empty cells: only the
+    patients with a probability for every selected model are returned.
+    """
+    store = pd.read_csv(oof_store_path(path_oof, split), index_col=0)
+    if models is not None:
+        store = store[["y"] + list(models)]
+    n_rows = len(store)
+    store = store.dropna()
+    if len(store) < n_rows:
+        print(f"Dropped {n_rows - len(store)} of {n_rows} patients without a probability for every model")
+    y = store.pop("y").to_numpy()
+    return store, y
@@ -0,0 +1,242 @@
+from collections import OrderedDict
+from copy import copy
+import numpy as np
+from joblib import hash as joblib_hash
+from sklearn.base import clone
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+from imblearn.over_sampling import SMOTE, BorderlineSMOTE, SVMSMOTE
+
+
+class NeighbourIndex:
+    """Neighbour searches of one training set, shared by all the SMOTE variants.
+
+    Everything is computed lazily and cached, so a sweep over SMOTE,
+    BorderlineSMOTE, SVMSMOTE and different sampling strategies fits the
+    neighbour searches (and the SVM) only once per training set and per k.
+    The searches are the ones imblearn runs (same NearestNeighbors settings,
+    same queries), so the results are identical.
+    """
+
+    def __init__(self, X, y):
+        self.X = X
+        self.y = y
+        self.reuses = 0
+        self._class_index = {}
+        self._k_neighbours = {}
+        self._nn_k = {}
+        self._nn_m = {}
+        self._n_majority = {}
+        self._svm = {}
+        self._support = {}
+
+    def class_index(self, class_sample):
+        """Indices in X of the samples of `class_sample`."""
+        if class_sample not in self._class_index:
+            self._class_index[class_sample] = np.flatnonzero(self.y == class_sample)
+        return self._class_index[class_sample]
+
+    def k_neighbours(self, class_sample, k):
+        """The k nearest neighbours (self excluded) of every sample within its class.
+
+        Indices refer to the rows of X[class_index(class_sample)]. Each k gets
+        its own search: slicing a larger one could order ties differently.
+        """
+        if (class_sample, k) in self._k_neighbours:
+            return self._k_neighbours[(class_sample, k)]
+        X_class = self.X[self.class_index(class_sample)]
+        nn = NearestNeighbors(n_neighbors=k + 1).fit(X_class)
+        self._nn_k[(class_sample, k)] = nn
+        self._k_neighbours[(class_sample, k)] = nn.kneighbors(X_class, return_distance=False)[:, 1:]
+        return self._k_neighbours[(class_sample, k)]
+
+    def nn_k(self, class_sample, k):
+        """NearestNeighbors fitted on the samples of `class_sample` (imblearn's nn_k_)."""
+        self.k_neighbours(class_sample, k)
+        return self._nn_k[(class_sample, k)]
+
+    def nn_m(self, m):
+        """NearestNeighbors fitted on the whole set (imblearn's nn_m_)."""
+        if m not in self._nn_m:
+            self._nn_m[m] = NearestNeighbors(n_neighbors=m + 1).fit(self.X)
+        return self._nn_m[m]
+
+    def n_majority(self, class_sample, m):
+        """Number of samples of other classes among the m nearest neighbours in the whole set."""
+        key = (class_sample, m)
+        if key not in self._n_majority:
+            neighbours = self.nn_m(m).kneighbors(self.X[self.class_index(class_sample)], return_distance=False)[:, 1:]
+            self._n_majority[key] = np.sum(self.y[neighbours] != class_sample, axis=1)
+        return self._n_majority[key]
+
+    def svm(self, svm_estimator):
+        """`svm_estimator` fitted on the whole set (once per set of parameters) and its cache key."""
+        params = svm_estimator.get_params()
+        # without probability=True the random_state does not change the fitted SVM
+        has_random_state = "random_state" in params
+        random_state = params.pop("random_state", None)
+        key = repr(sorted(params.items()))
+        if key in self._svm:
+            # SVC.fit draws a seed from its random_state, draw it anyway to keep the random stream of imblearn
+            check_random_state(random_state).randint(np.iinfo("i").max)
+            fitted = copy(self._svm[key])
+            if has_random_state:
+                fitted.set_params(random_state=random_state)
+            return fitted, key
+        self._svm[key] = clone(svm_estimator).fit(self.X, self.y)
+        return self._svm[key], key
+
+    def support(self, class_sample, svm_estimator):
+        """Positions, within the class, of the support vectors of `class_sample`, and the fitted SVM."""
+        fitted, key = self.svm(svm_estimator)
+        if (class_sample, key) not in self._support:
+            support = fitted.support_[self.y[fitted.support_] == class_sample]
+            self._support[(class_sample, key)] = np.searchsorted(self.class_index(class_sample), support)
+        return self._support[(class_sample, key)], fitted
+
+
+_INDEXES = OrderedDict()
+_MAX_INDEXES = 4
+
+
+def get_neighbour_index(X, y):
+    """Return the NeighbourIndex of (X, y), building it the first time."""
+    key = joblib_hash((np.ascontiguousarray(X), np.ascontiguousarray(y)))
+    if key in _INDEXES:
+        _INDEXES.move_to_end(key)
+        _INDEXES[key].reuses += 1
+    else:
+        if len(_INDEXES) >= _MAX_INDEXES:
+            _evict_index()
+        _INDEXES[key] = NeighbourIndex(X, y)
+    return _INDEXES[key]
+
+
+def _evict_index():
+    """Drop the least recently used index, the ones never reused go first.
+
+    An undersampled set is a new training set on every call: evicting those
+    first keeps the index of the full training set, that the sweep comes
+    back to, however many undersampled sets are resampled in between.
+    """
+    victim = next((key for key, index in _INDEXES.items() if index.reuses == 0), next(iter(_INDEXES)))
+    del _INDEXES[victim]
+
+
+def interpolate(seed, X_base, X_class, neighbours, n_samples, step_size=1.0):
+    """Vectorized SMOTE interpolation between random rows of X_base and one of their neighbours.
+
+    Draws the random numbers exactly as imblearn's BaseSMOTE._make_samples
+    (a new check_random_state(seed) per call), so the samples are the same.
+    """
+    random_state = check_random_state(seed)
+    samples_indices = random_state.randint(low=0, high=neighbours.size, size=n_samples)
+    steps = step_size * random_state.uniform(size=n_samples)[:, np.newaxis]
+    rows = np.floor_divide(samples_indices, neighbours.shape[1])
+    cols = np.mod(samples_indices, neighbours.shape[1])
+    X_new = X_base[rows] + steps * (X_class[neighbours[rows, cols]] - X_base[rows])
+    return X_new.astype(X_base.dtype)
+
+
+def _stack(X, y, class_sample, new_samples):
+    """Append the synthetic samples of one class to (X, y)."""
+    if len(new_samples) == 0:
+        return X, y
+    X_new = np.vstack(new_samples).astype(X.dtype)
+    y_new = np.full(len(X_new), class_sample, dtype=y.dtype)
+    return np.vstack((X, X_new)), np.hstack((y, y_new))
+
+
+class SharedSMOTE(SMOTE):
+    """SMOTE generating the samples from the shared NeighbourIndex."""
+
+    def _fit_resample(self, X, y):
+        if not isinstance(self.k_neighbors, int):
+            return super()._fit_resample(X, y)
+        self._validate_estimator()
+        index = get_neighbour_index(X, y)
+        X_resampled, y_resampled = X.copy(), y.copy()
+        for class_sample, n_samples in self.sampling_strategy_.items():
+            if n_samples == 0:
+                continue
+            X_class = X[index.class_index(class_sample)]
+            neighbours = index.k_neighbours(class_sample, self.k_neighbors)
+            self.nn_k_ = index.nn_k(class_sample, self.k_neighbors)
+            X_new = interpolate(self.random_state, X_class, X_class, neighbours, n_samples)
+            X_resampled, y_resampled = _stack(X_resampled, y_resampled, class_sample, [X_new])
+        return X_resampled, y_resampled
+
+
+class SharedBorderlineSMOTE(BorderlineSMOTE):
+    """borderline-1 SMOTE generating the samples from the shared NeighbourIndex."""
+
+    def _fit_resample(self, X, y):
+        if (self.kind != "borderline-1" or not isinstance(self.k_neighbors, int)
+                or not isinstance(self.m_neighbors, int)):
+            return super()._fit_resample(X, y)
+        self._validate_estimator()
+        index = get_neighbour_index(X, y)
+        X_resampled, y_resampled = X.copy(), y.copy()
+        self.in_danger_indices = {}
+        for class_sample, n_samples in self.sampling_strategy_.items():
+            if n_samples == 0:
+                continue
+            m = self.m_neighbors
+            self.nn_m_ = index.nn_m(m)
+            n_majority = index.n_majority(class_sample, m)
+            danger = np.flatnonzero((n_majority >= m / 2) & (n_majority < m))
+            if len(danger) == 0:
+                continue
+            self.in_danger_indices[class_sample] = index.class_index(class_sample)[danger]
+            X_class = X[index.class_index(class_sample)]
+            neighbours = index.k_neighbours(class_sample, self.k_neighbors)[danger]
+            self.nn_k_ = index.nn_k(class_sample, self.k_neighbors)
+            X_new = interpolate(self.random_state, X_class[danger], X_class, neighbours, n_samples)
+            X_resampled, y_resampled = _stack(X_resampled, y_resampled, class_sample, [X_new])
+        return X_resampled, y_resampled
+
+
+class SharedSVMSMOTE(SVMSMOTE):
+    """SVMSMOTE reusing the fitted SVM support set and the neighbours of the shared NeighbourIndex."""
+
+    def _fit_resample(self, X, y):
+        if not isinstance(self.k_neighbors, int) or not isinstance(self.m_neighbors, int):
+            return super()._fit_resample(X, y)
+        random_state = check_random_state(self.random_state)
+        self._validate_estimator()
+        svm_estimator = self.svm_estimator_
+        index = get_neighbour_index(X, y)
+        X_resampled, y_resampled = X.copy(), y.copy()
+        for class_sample, n_samples in self.sampling_strategy_.items():
+            if n_samples == 0:
+                continue
+            m = self.m_neighbors
+            support, self.svm_estimator_ = index.support(class_sample, svm_estimator)
+            self.nn_m_ = index.nn_m(m)
+            n_majority = index.n_majority(class_sample, m)[support]
+            support, n_majority = support[n_majority != m], n_majority[n_majority != m]
+            if len(support) == 0:
+                raise ValueError(
+                    "All support vectors are considered as noise. SVM-SMOTE is"
+                    " not adapted to your dataset. Try another SMOTE variant."
+                )
+            danger = (n_majority >= m / 2) & (n_majority < m)
+            X_class = X[index.class_index(class_sample)]
+            neighbours = index.k_neighbours(class_sample, self.k_neighbors)
+            self.nn_k_ = index.nn_k(class_sample, self.k_neighbors)
+            n_generated_samples = int(random_state.beta(10, 10) * (n_samples + 1))
+
+            new_samples = []
+            if np.count_nonzero(danger) > 0:
+                base = support[danger]
+                new_samples.append(interpolate(
+                    self.random_state, X_class[base], X_class, neighbours[base], n_generated_samples
+                ))
+            if np.count_nonzero(~danger) > 0:
+                base = support[~danger]
+                new_samples.append(interpolate(
+                    self.random_state, X_class[base], X_class, neighbours[base],
+                    n_samples - n_generated_samples, step_size=-self.out_step
+                ))
+            X_resampled, y_resampled = _stack(X_resampled, y_resampled, class_sample, new_samples)
+        return X_resampled, y_resampled
@@ -0,0 +1,175 @@
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from joblib import load, dump
+from sklearn.linear_model import LogisticRegression
+from sklearn.neural_network import MLPClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from xgboost import XGBClassifier
+from ensemble import evaluate_ensemble
+from resampled import load_resampled
+
+# Models whose previous trees are kept: their inputs must stay on the old scale
+TREE_CONTINUATION = (RandomForestClassifier, GradientBoostingClassifier, XGBClassifier)
+# Models that use the previous solution only as initialization
+WARM_START = (LogisticRegression, MLPClassifier)
+
+
+def refresh_model(pipe, X_new, y_new, X_train, y_train, n_estimators_step=20):
+    """Update a fitted pipeline with the appended rows `X_new, y_new`.
+
+    - lr, nn: the preprocessing statistics are re-fitted on old + new rows and
+      the model is warm-started from its current solution.
+    - rf, gb: `n_estimators_step` trees are added, fitted on old + new rows.
+    - xgb: boosting continues for `n_estimators_step` rounds from the current booster.
+    - other models (svc, knn, adaboost) have no warm start and are re-fitted
+      with their current hyperparameters.
+    For rf/gb/xgb the preprocessing is kept as is, the existing trees were
+    grown on that scale.
+    """
+    X_all = np.concatenate((X_train, X_new))
+    y_all = np.concatenate((y_train, y_new))
+    preprocess, model = pipe.named_steps["preprocess"], pipe.named_steps["model"]
+
+    if isinstance(model, XGBClassifier):
+        booster, n_estimators = model.get_booster(), model.n_estimators
+        model.set_params(n_estimators=n_estimators_step)
+        model.fit(preprocess.transform(X_all), y_all, xgb_model=booster)
+        # the booster now holds all the rounds, a later clone/refit must train as many
+        model.set_params(n_estimators=n_estimators + n_estimators_step)
+    elif isinstance(model, TREE_CONTINUATION):
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + n_estimators_step)
+        model.fit(preprocess.transform(X_all), y_all)
+    elif isinstance(model, WARM_START) and getattr(model, "solver", None) != "liblinear":
+        preprocess.fit(X_all, y_all)
+        model.set_params(warm_start=True)
+        model.fit(preprocess.transform(X_all), y_all)
+    else:
+        preprocess.fit(X_all, y_all)
+        model.fit(preprocess.transform(X_all), y_all)
+    return pipe
+
+
+def member_training_set(train_set):
+    """(X, y) of a member's training set, given as a tuple or as a resampled.ResampledDataset."""
+    if hasattr(train_set, "materialize"):
+        return train_set.materialize()
+    return train_set
+
+
+def load_train_sets(names, path_data, X_train, y_train):
+    """Training set of every member, as expected by refresh_ensemble.
+
+    A member `<model>_random_<sampler>_<model>` was trained on
+    path_data/train_random_<sampler>_<model>: the compact .npz (see
+    resampled.convert_resampled_csv) is used when present, the CSV otherwise.
+    The other members were trained on (X_train, y_train).
+    """
+    train_sets = {}
+    for name in names:
+        if "_random_" not in name:
+            train_sets[name] = (X_train, y_train)
+            continue
+        file_name = f"{path_data}train_random_{name.split('_random_', 1)[1]}"
+        if os.path.isfile(f"{file_name}.npz"):
+            train_sets[name] = load_resampled(f"{file_name}.npz", X_train, y_train)
+        else:
+            data = pd.read_csv(f"{file_name}.csv", index_col=0).to_numpy()
+            train_sets[name] = (data[:, :-1], data[:, -1])
+    return train_sets
+
+
+def resample_new_rows(name, sampler, X_new, y_new):
+    """Apply the member's sampler to the appended rows, so they keep the class balance it was trained on."""
+    if sampler is None:
+        return X_new, y_new
+    try:
+        return deepcopy(sampler).fit_resample(X_new, y_new)
+    except ValueError as e:
+        raise ValueError(f"{name}: cannot resample the {len(y_new)} new rows ({e}), "
+                         "wait for more follow-ups or run a full retrain") from e
+
+
+def backup_models(names, path_models):
+    """Copy the stored .joblib files to path_models/backup/ before they are overwritten."""
+    backup_dir = os.path.join(path_models, "backup")
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for name in names:
+        shutil.copy2(f"{path_models}{name}.joblib", os.path.join(backup_dir, f"{name}_{stamp}.joblib"))
+    return backup_dir
+
+
+def refresh_ensemble(
+    names,
+    path_models,
+    X_new,
+    y_new,
+    train_sets,
+    X_valid,
+    y_valid,
+    samplers=None,
+    tolerance=0.02,
+    n_estimators_step=20,
+    retrain=None,
+    save=True,
+    verbose=True
+):
+    """Refresh the ensemble members stored in `path_models` and re-score it.
+
+    Every member is refreshed on its own training set: `train_sets` maps the
+    member name to the (X, y) it was fitted on (e.g. its
+    train_random_<sampler>_<model> set, or a resampled.ResampledDataset).
+    load_train_sets builds it from the data directory. Members trained on
+    a resampled set (`_random_` in the name) also need
+    their over-sampler in `samplers`, which is re-run on the appended rows.
+
+    The refreshed ensemble is compared on the validation set with the stored
+    one: if auroc or f1 macro drop, or brier grows, by more than `tolerance`
+    the refreshed models are discarded and `retrain(names)` (the full
+    training chain) is called when given. Otherwise the refreshed models
+    overwrite the stored ones when `save` is True, after the previous files
+    are copied to path_models/backup/.
+    Returns (refreshed, scores_before, scores_after).
+    """
+    samplers = {} if samplers is None else samplers
+    for name in names:
+        if name not in train_sets:
+            raise ValueError(f"No training set given for {name}")
+        if "_random_" in name and samplers.get(name) is None:
+            raise ValueError(f"{name} was trained on a resampled set, its sampler is needed in `samplers`")
+
+    stored = [load(f"{path_models}{name}.joblib") for name in names]
+    before = evaluate_ensemble(stored, X_valid, y_valid, verbose=False)
+
+    refreshed = []
+    for name, model in zip(names, stored):
+        X_train, y_train = member_training_set(train_sets[name])
+        X_add, y_add = resample_new_rows(name, samplers.get(name), X_new, y_new)
+        refreshed.append(refresh_model(deepcopy(model), X_add, y_add, X_train, y_train, n_estimators_step))
+    after = evaluate_ensemble(refreshed, X_valid, y_valid, verbose=False)
+
+    drift = (before[0] - after[0] > tolerance
+             or before[1] - after[1] > tolerance
+             or after[2] - before[2] > tolerance)
+    if verbose:
+        print(f"stored    (auroc, f1, brier): {before}")
+        print(f"refreshed (auroc, f1, brier): {after}")
+
+    if drift:
+        if verbose:
+            print(f"Validation drift above tolerance {tolerance}, full retrain needed")
+        if retrain is not None:
+            retrain(names)
+        return False, before, after
+
+    if save:
+        backup_dir = backup_models(names, path_models)
+        if verbose:
+            print(f"Previous models copied to {backup_dir}")
+        for name, model in zip(names, refreshed):
+            dump(model, f"{path_models}{name}.joblib")
+    return True, before, after
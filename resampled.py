@@ -0,0 +1,145 @@
+import json
+import numpy as np
+import pandas as pd
+from joblib import hash as joblib_hash
+
+# Compact resampled training sets: instead of a full copy of the resampled data
+# only the indices of the original rows that were kept and the synthetic rows are
+# stored (.npz), together with the sampler config/seed and a hash of the original set.
+
+
+class ResampledDataset:
+    """A resampled training set expressed on top of the original (X, y)."""
+
+    def __init__(self, X, y, kept, X_synthetic, y_synthetic, synthetic_at, config):
+        self.X_original = X
+        self.y_original = y
+        self.kept = kept
+        self.X_synthetic = X_synthetic
+        self.y_synthetic = y_synthetic
+        self.synthetic_at = synthetic_at
+        self.config = config
+        self._materialized = None
+
+    def __len__(self):
+        return len(self.kept) + len(self.y_synthetic)
+
+    def parts(self):
+        """(X, y) of the original rows and of the synthetic rows, without building the full set.
+
+        When every original row is kept in order (oversampling only) the
+        first part is the original array itself, no copy is made.
+        """
+        if len(self.kept) == len(self.y_original) and np.array_equal(self.kept, np.arange(len(self.kept))):
+            original = (self.X_original, self.y_original)
+        else:
+            original = (self.X_original[self.kept], self.y_original[self.kept])
+        return original, (self.X_synthetic, self.y_synthetic)
+
+    def materialize(self):
+        """Full (X, y) in the resampled order, computed once and then cached."""
+        if self._materialized is None:
+            (X_kept, y_kept), (X_syn, y_syn) = self.parts()
+            n = len(self)
+            if np.array_equal(self.synthetic_at, np.arange(len(y_kept), n)):
+                X, y = np.concatenate((X_kept, X_syn)), np.concatenate((y_kept, y_syn))
+            else:
+                is_synthetic = np.zeros(n, dtype=bool)
+                is_synthetic[self.synthetic_at] = True
+                X = np.empty((n, X_kept.shape[1]), dtype=np.result_type(X_kept, X_syn))
+                y = np.empty(n, dtype=np.result_type(y_kept, y_syn))
+                X[~is_synthetic], y[~is_synthetic] = X_kept, y_kept
+                X[is_synthetic], y[is_synthetic] = X_syn, y_syn
+            self._materialized = (X, y)
+        return self._materialized
+
+    @property
+    def X(self):
+        return self.materialize()[0]
+
+    @property
+    def y(self):
+        return self.materialize()[1]
+
+
+def source_hash(X, y):
+    """Hash of the original training set, independent of the memory layout of the arrays."""
+    return joblib_hash((np.ascontiguousarray(X), np.ascontiguousarray(y)))
+
+
+def split_resampled(X, y, X_res, y_res):
+    """Find which rows of (X_res, y_res) are original rows of (X, y).
+
+    Returns (kept, synthetic_at): the original index of every kept row, in
+    order, and the positions of the synthetic rows in the resampled set.
+    Rows are matched by value, so the conversion is lossless.
+    """
+    rows = {}
+    for i, row in enumerate(np.column_stack((X, y)).astype(np.float64)):
+        rows.setdefault(row.tobytes(), []).append(i)
+    kept, synthetic_at = [], []
+    for i, row in enumerate(np.column_stack((X_res, y_res)).astype(np.float64)):
+        matches = rows.get(row.tobytes())
+        if matches:
+            kept.append(matches.pop(0))
+        else:
+            synthetic_at.append(i)
+    return np.array(kept, dtype=np.int64), np.array(synthetic_at, dtype=np.int64)
+
+
+def save_resampled(path, X, y, X_res, y_res, config):
+    """Store (X_res, y_res) as indices of (X, y) plus the synthetic rows, with the sampler `config`."""
+    kept, synthetic_at = split_resampled(X, y, X_res, y_res)
+    np.savez_compressed(
+        path,
+        kept=kept,
+        synthetic_at=synthetic_at,
+        X_synthetic=np.asarray(X_res)[synthetic_at],
+        y_synthetic=np.asarray(y_res)[synthetic_at],
+        config=json.dumps(config),
+        source_hash=source_hash(X, y),
+    )
+    return kept, synthetic_at
+
+
+def load_resampled(path, X, y):
+    """Load a resampled set saved by save_resampled, on top of its original (X, y)."""
+    data = np.load(path)
+    if str(data["source_hash"]) != source_hash(X, y):
+        raise ValueError(f"{path} was not generated from this training set")
+    return ResampledDataset(
+        X, y,
+        kept=data["kept"],
+        X_synthetic=data["X_synthetic"],
+        y_synthetic=data["y_synthetic"],
+        synthetic_at=data["synthetic_at"],
+        config=json.loads(str(data["config"])),
+    )
+
+
+def convert_resampled_csv(csv_path, train_path, out_path=None, config=None):
+    """Convert a train_random_<sampler>_<model>.csv into the compact format.
+
+    The result is checked against the CSV before returning, the CSV itself
+    is left untouched. Returns the path of the .npz file.
+    """
+    df_res = pd.read_csv(csv_path, index_col=0)
+    df_train = pd.read_csv(train_path, index_col=0)
+    if list(df_res.columns) != list(df_train.columns):
+        raise ValueError(f"{csv_path} and {train_path} have different columns")
+    train, res = df_train.to_numpy(dtype=np.float64), df_res.to_numpy(dtype=np.float64)
+    X, y = train[:, :-1], train[:, -1]
+
+    if config is None:
+        # train_random_<sampler>_<model>.csv, the seed was not recorded
+        _, _, sampler, model = csv_path.rsplit("/", 1)[-1].replace(".csv", "").split("_", 3)
+        config = {"sampler": sampler, "model": model, "seed": None}
+    if out_path is None:
+        out_path = csv_path.replace(".csv", ".npz")
+
+    save_resampled(out_path, X, y, res[:, :-1], res[:, -1], config)
+    dataset = load_resampled(out_path, X, y)
+    X_check, y_check = dataset.materialize()
+    if not (np.array_equal(X_check, res[:, :-1]) and np.array_equal(y_check, res[:, -1])):
+        raise ValueError(f"Lossy conversion of {csv_path}")
+    return out_path
@@ -0,0 +1,195 @@
+"""Lightweight scoring entry point for saved ensembles.
+
+Only numpy and joblib are imported at module level: unpickling the members
+imports just the estimators they are made of, and heavier modules (pandas,
+sklearn.metrics) are imported inside the functions that need them.
+
+    python scoring.py --path models/18features/ --models gb_random_svmsmote_gb rf_random_svmsmote_rf --data data/18features/test.csv
+    python scoring.py --path models/18features/ --models gb_random_svmsmote_gb rf_random_svmsmote_rf --data data/18features/test.csv --benchmark
+"""
+import os
+import sys
+import time
+import numpy as np
+from joblib import load
+
+# Cold-start budget (seconds) for `import scoring`, loading the ensemble and the first prediction.
+# Set from the first row of models_output/cold_start.csv (gb + rf svmsmote members of 18features,
+# import 0.17s, total 1.97s; up to 0.21s and 2.13s over three more runs) with some headroom.
+IMPORT_BUDGET = 0.25
+COLD_START_BUDGET = 2.5
+# Anchored to this directory, like the child interpreter of measure_cold_start
+_HERE = os.path.dirname(os.path.abspath(__file__))
+COLD_START_LOG = os.path.join(_HERE, "models_output", "cold_start.csv")
+
+# Ensemble preloaded in the parent, shared copy-on-write with the forked workers
+_ENSEMBLE = None
+_WEIGHTS = None
+
+
+def load_ensemble(models, path):
+    """Load the members `models` from `path`."""
+    return [load(f"{path}{m}.joblib") for m in models]
+
+
+def _member_proba(model, X):
+    """predict_proba of one member and the time it took."""
+    start = time.perf_counter()
+    proba = model.predict_proba(X)
+    return proba, time.perf_counter() - start
+
+
+def _n_workers(n_jobs):
+    """Number of threads for `n_jobs`, with joblib's convention: -1 is all cores, -2 all but one..."""
+    if n_jobs is None:
+        return 1
+    if n_jobs == 0:
+        raise ValueError("n_jobs == 0 has no meaning, use None, a positive number or -1 for all cores")
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return n_jobs
+
+
+def predict_proba(ensemble, X, weights=None, n_jobs=None, return_timings=False):
+    """Weighted mean of the members' probabilities, accumulated in one preallocated array.
+
+    With `n_jobs` > 1 (or negative as in joblib, -1 for all cores) the members
+    predict concurrently on a thread pool of at most one thread per member
+    (tree traversal and BLAS release the GIL), the probabilities are still
+    accumulated in member order. With `return_timings=True` the
+    predict_proba time of every member is also returned.
+    """
+    weights = np.ones(len(ensemble)) if weights is None else np.asarray(weights, dtype=float)
+    if len(weights) != len(ensemble):
+        raise ValueError(f"{len(weights)} weights for {len(ensemble)} members")
+    weights = weights / weights.sum()
+    y_proba = np.zeros((len(X), 2))
+    timings = np.zeros(len(ensemble))
+
+    n_workers = min(_n_workers(n_jobs), len(ensemble))
+    if n_workers <= 1:
+        results = (_member_proba(m, X) for m in ensemble)
+        executor = None
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+        results = executor.map(_member_proba, ensemble, [X] * len(ensemble))
+    try:
+        for i, (proba, elapsed) in enumerate(results):
+            y_proba += weights[i] * proba
+            timings[i] = elapsed
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if return_timings:
+        return y_proba, timings
+    return y_proba
+
+
+def score(ensemble, X, threshold=0.5, weights=None):
+    y_proba = predict_proba(ensemble, X, weights)
+    return y_proba, y_proba[:, 1] > threshold
+
+
+def evaluate(ensemble, X, y, threshold=0.5, weights=None):
+    """(auroc, f1 macro, brier) as ensemble.evaluate_ensemble, sklearn.metrics is imported here."""
+    from sklearn.metrics import f1_score, roc_auc_score, brier_score_loss
+    y_proba, y_pred = score(ensemble, X, threshold, weights)
+    return (roc_auc_score(y, y_proba[:, 1]), f1_score(y, y_pred, average="macro"), brier_score_loss(y, y_proba[:, 1]))
+
+
+def preload(models, path, weights=None):
+    """Load the ensemble in this (parent) process, before forking the workers."""
+    global _ENSEMBLE, _WEIGHTS
+    _ENSEMBLE = load_ensemble(models, path)
+    _WEIGHTS = weights
+    return _ENSEMBLE
+
+
+def _score_preloaded(X):
+    return predict_proba(_ENSEMBLE, X, _WEIGHTS)
+
+
+def score_forked(batches, n_workers=None):
+    """Score `batches` on forked workers sharing the preloaded ensemble copy-on-write.
+
+    Call preload first. Fork is only available on POSIX systems.
+    """
+    import multiprocessing
+    if _ENSEMBLE is None:
+        raise RuntimeError("No ensemble preloaded, call preload first")
+    with multiprocessing.get_context("fork").Pool(n_workers) as pool:
+        return pool.map(_score_preloaded, batches)
+
+
+def read_features(data_path):
+    """Features of a data CSV (index = patient Number, last column = target)."""
+    import pandas as pd
+    return pd.read_csv(data_path, index_col=0).to_numpy()[:, :-1]
+
+
+def measure_cold_start(models, path, data_path, log_path=COLD_START_LOG):
+    """Time a cold start in a fresh interpreter and append it to `log_path`.
+
+    Measures `import scoring`, loading the ensemble and the first prediction
+    on `data_path`, so the budget can be tracked over time.
+    """
+    import csv
+    import json
+    import subprocess
+    from datetime import datetime
+
+    # the child runs from this directory (to import scoring), the paths are relative to the caller
+    path = os.path.join(os.path.abspath(path), "")
+    data_path = os.path.abspath(data_path)
+    code = (
+        "import time, json, sys; t0 = time.perf_counter()\n"
+        "import scoring; t1 = time.perf_counter()\n"
+        f"ens = scoring.load_ensemble({models!r}, {path!r}); t2 = time.perf_counter()\n"
+        f"X = scoring.read_features({data_path!r}); t3 = time.perf_counter()\n"
+        "scoring.predict_proba(ens, X); t4 = time.perf_counter()\n"
+        "print(json.dumps({'import': t1 - t0, 'load': t2 - t1, 'first_predict': t4 - t3, "
+        "'modules': len(sys.modules)}))\n"
+    )
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=_HERE)
+    total = time.perf_counter() - start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["total"] = total
+    result["within_budget"] = result["import"] <= IMPORT_BUDGET and total <= COLD_START_BUDGET
+
+    row = {"date": datetime.now().isoformat(timespec="seconds"), "models": " ".join(models), **result}
+    new_file = not os.path.isfile(log_path)
+    with open(log_path, 'a+', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+        if new_file:
+            writer.writeheader()
+        writer.writerow(row)
+    return result
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Score a data CSV with a saved ensemble.")
+    parser.add_argument("--path", required=True, help="directory of the .joblib models, e.g. models/18features/")
+    parser.add_argument("--models", nargs="+", required=True)
+    parser.add_argument("--data", required=True, help="CSV with the same columns as the training data")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--benchmark", action="store_true", help="measure and log the cold start instead of scoring")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = measure_cold_start(args.models, args.path, args.data)
+        print(result)
+        return 0 if result["within_budget"] else 1
+
+    y_proba, y_pred = score(load_ensemble(args.models, args.path), read_features(args.data), args.threshold)
+    for p, pred in zip(y_proba[:, 1], y_pred):
+        print(f"{p:.6f},{int(pred)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import os
+from collections import Counter, OrderedDict
+import numpy as np
+import pandas as pd
+import pytest
+from imblearn.over_sampling import SMOTE, BorderlineSMOTE, SVMSMOTE
+from imblearn.under_sampling import RandomUnderSampler
+import oversampling
+from oversampling import SharedSMOTE, SharedBorderlineSMOTE, SharedSVMSMOTE, get_neighbour_index
+
+
+@pytest.fixture(scope="module")
+def train_set():
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "18features", "train.csv")
+    train = pd.read_csv(path, index_col=0).to_numpy()
+    return train[:, :-1], train[:, -1]
+
+
+def assert_same_resampling(reference, shared, X, y):
+    X_ref, y_ref = reference.fit_resample(X, y)
+    X_new, y_new = shared.fit_resample(X, y)
+    assert Counter(y_new) == Counter(y_ref)
+    np.testing.assert_array_equal(y_new, y_ref)
+    np.testing.assert_array_equal(X_new, X_ref)
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4])
+def test_smote_matches_imblearn(train_set, k):
+    X, y = train_set
+    assert_same_resampling(
+        SMOTE(sampling_strategy=1.0, k_neighbors=k, random_state=0),
+        SharedSMOTE(sampling_strategy=1.0, k_neighbors=k, random_state=0),
+        X, y,
+    )
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4])
+def test_borderline_smote_matches_imblearn(train_set, k):
+    X, y = train_set
+    reference = BorderlineSMOTE(sampling_strategy=1.0, k_neighbors=k, random_state=0)
+    shared = SharedBorderlineSMOTE(sampling_strategy=1.0, k_neighbors=k, random_state=0)
+    assert_same_resampling(reference, shared, X, y)
+    # same danger set
+    assert reference.in_danger_indices.keys() == shared.in_danger_indices.keys()
+    for class_sample, danger in reference.in_danger_indices.items():
+        np.testing.assert_array_equal(shared.in_danger_indices[class_sample], danger)
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4])
+def test_svm_smote_matches_imblearn(train_set, k):
+    X, y = train_set
+    reference = SVMSMOTE(sampling_strategy=1.0, k_neighbors=k, random_state=0)
+    shared = SharedSVMSMOTE(sampling_strategy=1.0, k_neighbors=k, random_state=0)
+    assert_same_resampling(reference, shared, X, y)
+
+    # same support set and noise set for the over-sampled class
+    class_sample = min(Counter(y), key=Counter(y).get)
+    index = get_neighbour_index(X, y)
+    support_ref = reference.svm_estimator_.support_
+    support_ref = support_ref[y[support_ref] == class_sample]
+    support, _ = index.support(class_sample, shared.svm_estimator_)
+    np.testing.assert_array_equal(index.class_index(class_sample)[support], support_ref)
+
+    m = shared.m_neighbors
+    noise_ref = reference._in_danger_noise(reference.nn_m_, X[support_ref], class_sample, y, kind="noise")
+    np.testing.assert_array_equal(index.n_majority(class_sample, m)[support] == m, noise_ref)
+
+
+@pytest.mark.parametrize("ratio", [0.2, 0.35, 0.5])
+def test_sweep_after_undersampling_matches_imblearn(train_set, ratio):
+    # as datasetSampler(useUnderSampler=True) in the 3.1 sampling notebook
+    X, y = RandomUnderSampler(sampling_strategy=ratio, random_state=0).fit_resample(*train_set)
+    for reference, shared in [(SMOTE, SharedSMOTE), (BorderlineSMOTE, SharedBorderlineSMOTE), (SVMSMOTE, SharedSVMSMOTE)]:
+        assert_same_resampling(
+            reference(sampling_strategy=1.0, k_neighbors=2, random_state=1),
+            shared(sampling_strategy=1.0, k_neighbors=2, random_state=1),
+            X, y,
+        )
+
+
+def test_global_random_state_matches_imblearn(train_set):
+    # the 3.1 notebook leaves random_state=None: both draw from numpy's global generator
+    X, y = train_set
+    for reference, shared in [(SMOTE, SharedSMOTE), (BorderlineSMOTE, SharedBorderlineSMOTE), (SVMSMOTE, SharedSVMSMOTE)]:
+        np.random.seed(7)
+        X_ref, y_ref = reference(sampling_strategy=1.0, k_neighbors=3).fit_resample(X, y)
+        np.random.seed(7)
+        X_new, y_new = shared(sampling_strategy=1.0, k_neighbors=3).fit_resample(X, y)
+        np.testing.assert_array_equal(X_new, X_ref)
+        np.testing.assert_array_equal(y_new, y_ref)
+
+
+def test_fitted_attributes_match_imblearn(train_set):
+    X, y = train_set
+    for reference, shared in [(SMOTE, SharedSMOTE), (BorderlineSMOTE, SharedBorderlineSMOTE), (SVMSMOTE, SharedSVMSMOTE)]:
+        reference = reference(sampling_strategy=1.0, k_neighbors=2, random_state=0)
+        shared = shared(sampling_strategy=1.0, k_neighbors=2, random_state=0)
+        reference.fit_resample(X, y)
+        shared.fit_resample(X, y)
+        for name in ("nn_k_", "nn_m_", "svm_estimator_"):
+            assert hasattr(shared, name) == hasattr(reference, name), name
+            if hasattr(reference, name):
+                fitted_ref, fitted = getattr(reference, name), getattr(shared, name)
+                assert fitted.get_params() == fitted_ref.get_params()
+                np.testing.assert_array_equal(getattr(fitted, "_fit_X", None), getattr(fitted_ref, "_fit_X", None))
+                np.testing.assert_array_equal(getattr(fitted, "support_", None), getattr(fitted_ref, "support_", None))
+
+
+def test_sweep_keeps_the_full_training_set_index(train_set, monkeypatch):
+    # loop of the 3.1 notebook: 9 calls on X_train, then 9 on fresh undersampled sets, for every ratio
+    built = []
+
+    class CountingIndex(oversampling.NeighbourIndex):
+        def __init__(self, X, y):
+            built.append(len(y))
+            super().__init__(X, y)
+
+    monkeypatch.setattr(oversampling, "NeighbourIndex", CountingIndex)
+    monkeypatch.setattr(oversampling, "_INDEXES", OrderedDict())
+    X, y = train_set
+    overs = [SharedSMOTE(sampling_strategy=1.0), SharedBorderlineSMOTE(sampling_strategy=1.0),
+             SharedSVMSMOTE(sampling_strategy=1.0)]
+    for ratio in (0.2, 0.35, 0.5):
+        for use_under_sampler in (False, True):
+            for over in overs:
+                for k in range(2, 5):
+                    X_sample, y_sample = X, y
+                    if use_under_sampler:
+                        X_sample, y_sample = RandomUnderSampler(sampling_strategy=ratio).fit_resample(X, y)
+                    over.set_params(k_neighbors=k, random_state=0).fit_resample(X_sample, y_sample)
+    assert built.count(len(y)) == 1
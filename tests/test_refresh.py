@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import load
+from imblearn.over_sampling import SVMSMOTE
+from refresh import refresh_model, refresh_ensemble, load_train_sets
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+PATH_DATA = os.path.join(ROOT, "data", "18features", "")
+PATH_MODELS = os.path.join(ROOT, "models", "18features", "")
+NAMES = ["lr_random_svmsmote_lr", "xgb", "knn"]
+
+
+def read_split(split):
+    data = pd.read_csv(f"{PATH_DATA}{split}.csv", index_col=0).to_numpy()
+    return data[:, :-1], data[:, -1]
+
+
+@pytest.fixture(scope="module")
+def splits():
+    return read_split("train"), read_split("valid"), read_split("test")
+
+
+def refresh(splits, tolerance, retrain=None):
+    (X, y), (X_valid, y_valid), (X_test, y_test) = splits
+    samplers = {"lr_random_svmsmote_lr": SVMSMOTE(sampling_strategy=1.0, k_neighbors=2, random_state=0)}
+    return refresh_ensemble(
+        NAMES, PATH_MODELS, X_test[:200], y_test[:200], load_train_sets(NAMES, PATH_DATA, X, y),
+        X_valid, y_valid, samplers=samplers, tolerance=tolerance, retrain=retrain, save=False, verbose=False,
+    )
+
+
+def stored_state():
+    return {name: os.path.getmtime(f"{PATH_MODELS}{name}.joblib") for name in NAMES}
+
+
+def test_refresh_keeps_models_within_tolerance(splits):
+    state = stored_state()
+    refreshed, before, after = refresh(splits, tolerance=1.0)
+    assert refreshed
+    assert len(before) == len(after) == 3
+    assert stored_state() == state
+
+
+def test_refresh_drift_calls_retrain(splits):
+    state = stored_state()
+    calls = []
+    refreshed, _, _ = refresh(splits, tolerance=-1.0, retrain=calls.append)
+    assert not refreshed
+    assert calls == [NAMES]
+    assert stored_state() == state
+
+
+def test_refresh_needs_the_sampler_of_resampled_members(splits):
+    (X, y), (X_valid, y_valid), (X_test, y_test) = splits
+    with pytest.raises(ValueError, match="sampler"):
+        refresh_ensemble(NAMES, PATH_MODELS, X_test[:200], y_test[:200], load_train_sets(NAMES, PATH_DATA, X, y),
+                         X_valid, y_valid, save=False, verbose=False)
+
+
+def test_xgb_refresh_keeps_the_total_number_of_rounds(splits):
+    (X, y), _, (X_test, y_test) = splits
+    pipe = load(f"{PATH_MODELS}xgb.joblib")
+    model = pipe.named_steps["model"]
+    rounds = model.get_booster().num_boosted_rounds()
+    refresh_model(pipe, X_test[:200], y_test[:200], X, y, n_estimators_step=20)
+    assert model.get_booster().num_boosted_rounds() == rounds + 20
+    assert model.n_estimators == rounds + 20
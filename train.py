@@ -4,6 +4,15 @@ from contextlib import redirect_stdout
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import RandomizedSearchCV
 import joblib
+import csv
+import json
+import os
+import time
+from sklearn.base import clone
+from sklearn.model_selection import cross_val_predict
+from imblearn.pipeline import Pipeline as ImbPipeline
+from oof import update_oof_store
+from hyperparameters import unique_candidates
 
 def report(results, n_top=3):
     """Utility function to report the best scores."""
@@ -19,18 +28,75 @@ def report(results, n_top=3):
             print("")
             
 
-def evaluate(pipe, X, y, plot=False):
-    """Evaluate models."""
+def compute_metrics(pipe, X, y):
+    """Compute the evaluation metrics once, to be rendered by print_metrics / metrics_row.
+
+    The labels come from `predict` and not from the argmax of the
+    probabilities: they differ for SVC(probability=True).
+    """
+    start = time.perf_counter()
     y_pred = pipe.predict(X)
-    print(classification_report(y, y_pred, digits=3))
-    print(f"auc macro {roc_auc_score(y, pipe.predict_proba(X)[:, 1]):.3f}")
+    y_proba = pipe.predict_proba(X)
+    predict_time = time.perf_counter() - start
+    return {
+        "report": classification_report(y, y_pred, digits=3, output_dict=True),
+        "report_text": classification_report(y, y_pred, digits=3),
+        # auc is undefined on a single-class split
+        "auc": roc_auc_score(y, y_proba[:, 1]) if len(np.unique(y)) > 1 else np.nan,
+        "confusion_matrix": confusion_matrix(y, y_pred, labels=pipe.classes_).tolist(),
+        "n_samples": len(y),
+        "predict_time": predict_time,
+        "y_proba": y_proba,
+        "classes": pipe.classes_,
+    }
+
+
+def print_metrics(metrics, plot=False):
+    """Print the metrics returned by compute_metrics."""
+    print(metrics["report_text"])
+    print(f"auc macro {metrics['auc']:.3f}")
 
     if plot:
-        ConfusionMatrixDisplay.from_estimator(pipe, X, y, normalize=None, values_format = '')
+        ConfusionMatrixDisplay(np.array(metrics["confusion_matrix"]), display_labels=metrics["classes"]).plot(values_format = '')
         ConfusionMatrixDisplay.grid(False)
     else:
         print("confusion matrix")
-        print(confusion_matrix(y, y_pred))
+        print(np.array(metrics["confusion_matrix"]))
+
+
+def metrics_row(savename, split, metrics, params=None):
+    """Flatten the metrics into one machine-readable row."""
+    (tn, fp), (fn, tp) = metrics["confusion_matrix"]
+    return {
+        "savename": savename,
+        "split": split,
+        "accuracy": metrics["report"]["accuracy"],
+        "f1_macro": metrics["report"]["macro avg"]["f1-score"],
+        "precision_macro": metrics["report"]["macro avg"]["precision"],
+        "recall_macro": metrics["report"]["macro avg"]["recall"],
+        "auc": metrics["auc"],
+        "tn": tn, "fp": fp, "fn": fn, "tp": tp,
+        "n_samples": metrics["n_samples"],
+        "predict_time": metrics["predict_time"],
+        "params": json.dumps(params, default=str) if params is not None else "",
+    }
+
+
+def append_metrics_csv(path, rows):
+    """Append rows to a CSV file, writing the header if the file is new."""
+    new_file = not os.path.isfile(path)
+    with open(path, 'a+', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def evaluate(pipe, X, y, plot=False):
+    """Evaluate models."""
+    metrics = compute_metrics(pipe, X, y)
+    print_metrics(metrics, plot=plot)
+    return metrics
 
 
 def train_and_evaluate(
@@ -47,8 +113,28 @@ def train_and_evaluate(
     savename="",
     path_models ="",
     output_models = "",
-    suffix = ""
+    suffix = "",
+    save_oof = False,
+    path_oof = "",
+    ids_train = None,
+    ids_valid = None,
+    X_oof = None,
+    y_oof = None,
+    sampler = None
 ):
+    """Search, evaluate and optionally save the best pipeline.
+
+    With `save_oof=True` the out-of-fold training probabilities and the
+    validation probabilities of the best configuration are written to the
+    store in `path_oof` (see oof.py), keyed by the patient ids.
+    For a resampled training set (train_random_* files) the synthetic rows
+    have no id: pass the original training rows as `X_oof, y_oof` (with
+    their `ids_train`) and the `sampler` that built X_train, the sampler is
+    then re-run inside every fold and the out-of-fold probabilities are
+    computed on the original rows only.
+    """
+    if save_oof:
+        check_oof_args(X_train, X_valid, ids_train, ids_valid, X_oof, y_oof, sampler)
     rand = train(
         preprocess=preprocess,
         model=model,
@@ -59,10 +145,13 @@ def train_and_evaluate(
         iter=iter
     )
     
+    train_metrics = compute_metrics(rand.best_estimator_, X_train, y_train)
+    valid_metrics = compute_metrics(rand.best_estimator_, X_valid, y_valid)
+
     print("Testing on training set:")
-    evaluate(rand.best_estimator_, X_train, y_train)
+    print_metrics(train_metrics)
     print("Testing on validation set:")
-    evaluate(rand.best_estimator_, X_valid, y_valid)
+    print_metrics(valid_metrics)
     report(rand.cv_results_, n_top=5)
     file_name = output_models.replace("models_output/", '').replace("/","") + suffix + ".txt"
 
@@ -72,15 +161,51 @@ def train_and_evaluate(
             with redirect_stdout(f):
                 print (f"####################   {savename}    #########################")
                 print("Testing on training set:")
-                evaluate(rand.best_estimator_, X_train, y_train)
+                print_metrics(train_metrics)
                 print("Testing on validation set:")
-                evaluate(rand.best_estimator_, X_valid, y_valid)
+                print_metrics(valid_metrics)
                 report(rand.cv_results_, n_top=1)
                 print (f"####################   {savename}  END   #########################")
+        # Same results as one CSV row per split, to aggregate runs without parsing the log
+        append_metrics_csv(f"{output_models}{file_name.replace('.txt', '.csv')}", [
+            metrics_row(savename, "train", train_metrics, rand.best_params_),
+            metrics_row(savename, "valid", valid_metrics, rand.best_params_),
+        ])
         joblib.dump(rand.best_estimator_, f"{path_models}{savename}.joblib")
+
+    if save_oof:
+        if X_oof is None:
+            oof_pipe, X_oof, y_oof = clone(rand.best_estimator_), X_train, y_train
+        else:
+            oof_pipe = ImbPipeline([('sampler', clone(sampler))] + clone(rand.best_estimator_).steps)
+        oof_proba = cross_val_predict(oof_pipe, X_oof, y_oof, cv=2, n_jobs=-1, method="predict_proba")[:, 1]
+        update_oof_store(path_oof, "train", savename, ids_train, y_oof, oof_proba)
+        update_oof_store(path_oof, "valid", savename, ids_valid, y_valid, valid_metrics["y_proba"][:, 1])
     
     return rand.best_estimator_
 
+def check_oof_args(X_train, X_valid, ids_train, ids_valid, X_oof, y_oof, sampler):
+    """Validate the out-of-fold arguments of train_and_evaluate before the search starts."""
+    if ids_train is None or ids_valid is None:
+        raise ValueError("save_oof=True needs ids_train and ids_valid (the patient Number of every row)")
+    if len(ids_valid) != len(X_valid):
+        raise ValueError(f"ids_valid has {len(ids_valid)} ids for {len(X_valid)} validation rows")
+    if X_oof is None:
+        if sampler is not None or y_oof is not None:
+            raise ValueError("sampler and y_oof need X_oof, the original training rows")
+        if len(ids_train) != len(X_train):
+            raise ValueError(
+                f"ids_train has {len(ids_train)} ids for {len(X_train)} training rows: for a resampled "
+                "training set pass the original rows as X_oof, y_oof and the sampler that built it"
+            )
+    else:
+        if y_oof is None or sampler is None:
+            raise ValueError("X_oof needs y_oof and the sampler used to build X_train")
+        if not len(ids_train) == len(X_oof) == len(y_oof):
+            raise ValueError(f"ids_train, X_oof and y_oof have different lengths "
+                             f"({len(ids_train)}, {len(X_oof)}, {len(y_oof)})")
+
+
 def train(
     preprocess, 
     model, 
@@ -90,15 +215,21 @@ def train(
     scoring="f1_macro", 
     iter=5000,
 ):
-    """Train and evaluation pipeline."""
+    """Train and evaluation pipeline.
+
+    `iter` configurations are sampled from `hyperparams` and the duplicates
+    dropped (see hyperparameters.unique_candidates), every unique candidate
+    is then evaluated once.
+    """
+    candidates = unique_candidates(hyperparams, n_iter=iter)
     pipe = Pipeline(steps=[
         ('preprocess', preprocess), 
         ('model', model)
     ])
 
     rand = RandomizedSearchCV(estimator= pipe,
-                              param_distributions=hyperparams,
-                              n_iter=iter,
+                              param_distributions=candidates,
+                              n_iter=len(candidates),
                               scoring=scoring,
                               cv=2,
                               n_jobs=-1,    # use all processors
@@ -106,4 +237,4 @@ def train(
                               return_train_score=True,
                               verbose=0).fit(X_train, y_train)
     
-    return rand
\ No newline at end of file
+    return rand
@@ -0,0 +1,222 @@
+import json
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier, AdaBoostClassifier
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _compile_preprocess(preprocess):
+    """ColumnTransformer of StandardScaler/passthrough -> (column order, mean, scale), None otherwise."""
+    if not isinstance(preprocess, ColumnTransformer):
+        return None
+    columns = np.arange(preprocess.n_features_in_)
+    order, mean, scale = [], [], []
+    for _, transformer, cols in preprocess.transformers_:
+        if isinstance(transformer, str) and transformer == "drop":
+            continue
+        try:
+            cols = columns[cols]
+        except IndexError:
+            # column names (DataFrame input) are not supported
+            return None
+        if len(cols) == 0:
+            continue
+        if isinstance(transformer, str) and transformer == "passthrough":
+            mean.append(np.zeros(len(cols)))
+            scale.append(np.ones(len(cols)))
+        elif isinstance(transformer, StandardScaler):
+            # mean_ is computed even with with_mean=False, but transform does not use it
+            mean.append(transformer.mean_ if transformer.with_mean else np.zeros(len(cols)))
+            scale.append(transformer.scale_ if transformer.with_std else np.ones(len(cols)))
+        else:
+            return None
+        order.append(cols)
+    return np.concatenate(order), np.concatenate(mean), np.concatenate(scale)
+
+
+def _depth(left, right):
+    """Depth of a tree given its children arrays (-1 for the leaves)."""
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return depth.max()
+
+
+def _sklearn_tree(tree, leaf_value):
+    """Flat arrays of a fitted sklearn tree, `leaf_value(value)` maps tree_.value to the leaf output."""
+    t = tree.tree_
+    left = t.children_left.astype(np.int64)
+    right = t.children_right.astype(np.int64)
+    is_leaf = left == -1
+    missing_left = getattr(t, "missing_go_to_left", np.zeros(t.node_count, dtype=np.uint8)).astype(bool)
+    return {
+        "feature": np.where(is_leaf, 0, t.feature).astype(np.int64),
+        "threshold": np.where(is_leaf, 0, t.threshold),
+        "left": left,
+        "right": right,
+        "missing_left": missing_left,
+        # tree_.value is (n_nodes, n_outputs, n_classes)
+        "value": np.where(is_leaf, leaf_value(t.value[:, 0, :]), 0),
+    }
+
+
+def _class_fraction(value):
+    return value[:, 1] / value.sum(axis=1)
+
+
+def _xgb_trees(model):
+    """Flat arrays of the trees of a fitted XGBClassifier, plus the base margin."""
+    learner = json.loads(model.get_booster().save_raw(raw_format="json"))["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"Unsupported xgboost objective {learner['objective']['name']}")
+    booster = learner["gradient_booster"]
+    if booster["name"] == "dart":
+        weights = booster["weight_drop"]
+        booster = booster["gbtree"]
+    elif booster["name"] == "gbtree":
+        weights = None
+    else:
+        raise ValueError(f"Unsupported xgboost booster {booster['name']}")
+    base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+
+    trees = []
+    for i, tree in enumerate(booster["model"]["trees"]):
+        left = np.array(tree["left_children"], dtype=np.int64)
+        right = np.array(tree["right_children"], dtype=np.int64)
+        is_leaf = left == -1
+        split = np.array(tree["split_conditions"], dtype=np.float32)
+        weight = weights[i] if weights is not None else 1.0
+        trees.append({
+            "feature": np.where(is_leaf, 0, tree["split_indices"]).astype(np.int64),
+            # xgboost goes left when x < split: on float32 inputs that is x <= previous float32
+            "threshold": np.where(is_leaf, 0, np.nextafter(split, np.float32(-np.inf))).astype(np.float64),
+            "left": left,
+            "right": right,
+            "missing_left": np.array(tree["default_left"], dtype=bool),
+            # the leaf value is stored in split_conditions
+            "value": np.where(is_leaf, split.astype(np.float64) * weight, 0),
+        })
+    return trees, np.log(base_score / (1 - base_score))
+
+
+def _compile_model(model):
+    """Return (trees, link, bias) for a supported tree ensemble."""
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        trees = [_sklearn_tree(est, _class_fraction) for est in model.estimators_]
+        return trees, "mean", 0.0
+    if isinstance(model, DecisionTreeClassifier):
+        return [_sklearn_tree(model, _class_fraction)], "mean", 0.0
+    if isinstance(model, GradientBoostingClassifier):
+        lr = model.learning_rate
+        trees = [_sklearn_tree(est, lambda v: lr * v[:, 0]) for est in model.estimators_[:, 0]]
+        # the init estimator gives a constant raw prediction
+        bias = model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0]
+        return trees, "sigmoid", bias
+    if isinstance(model, AdaBoostClassifier):
+        n = len(model.estimators_)
+        if getattr(model, "algorithm", "SAMME") == "SAMME.R":
+            eps = np.finfo(np.float64).eps
+
+            def leaf_value(v):
+                proba = np.clip(v / v.sum(axis=1, keepdims=True), eps, None)
+                return (np.log(proba[:, 1]) - np.log(proba[:, 0])) / n
+            trees = [_sklearn_tree(est, leaf_value) for est in model.estimators_]
+        else:
+            weights = model.estimator_weights_[:n]
+            trees = [
+                _sklearn_tree(est, lambda v, w=w: np.where(v[:, 1] > v[:, 0], 2 * w, -2 * w) / weights.sum())
+                for est, w in zip(model.estimators_, weights)
+            ]
+        return trees, "sigmoid", 0.0
+    if isinstance(model, XGBClassifier):
+        trees, bias = _xgb_trees(model)
+        return trees, "sigmoid", bias
+    raise ValueError(f"Unsupported model {type(model).__name__}")
+
+
+class CompiledTreePipeline:
+    """A fitted tree-based pipeline compiled to flat NumPy node arrays.
+
+    predict_proba traverses all the trees level by level for the whole
+    batch at once, so it can replace the pipeline as an ensemble member.
+    """
+
+    def __init__(self, pipe):
+        preprocess, model = pipe.named_steps["preprocess"], pipe.named_steps["model"]
+        self.classes_ = model.classes_
+        self.preprocess = preprocess
+        self.scaling = _compile_preprocess(preprocess)
+        trees, self.link, self.bias = _compile_model(model)
+
+        offsets = np.cumsum([0] + [len(t["left"]) for t in trees])
+        self.roots = offsets[:-1]
+        self.max_depth = max(_depth(t["left"], t["right"]) for t in trees)
+        for key in ("feature", "threshold", "missing_left", "value"):
+            setattr(self, key, np.concatenate([t[key] for t in trees]))
+        # children indices become global, leaves stay -1
+        self.left = np.concatenate([np.where(t["left"] == -1, -1, t["left"] + o) for t, o in zip(trees, offsets)])
+        self.right = np.concatenate([np.where(t["right"] == -1, -1, t["right"] + o) for t, o in zip(trees, offsets)])
+
+    def transform(self, X):
+        if self.scaling is None:
+            return self.preprocess.transform(X)
+        order, mean, scale = self.scaling
+        X = np.asarray(X, dtype=np.float64)[:, order]
+        return (X - mean) / scale
+
+    def leaves(self, X):
+        """Leaf reached in every tree by every sample, shape (n_samples, n_trees)."""
+        # trees work on float32 inputs
+        X = np.asarray(self.transform(X), dtype=np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(self.left[node] == -1, node, np.where(go_left, self.left[node], self.right[node]))
+        return node
+
+    def predict_proba(self, X):
+        values = self.value[self.leaves(X)]
+        if self.link == "mean":
+            proba = values.mean(axis=1)
+        else:
+            proba = _sigmoid(self.bias + values.sum(axis=1))
+        return np.column_stack((1 - proba, proba))
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+def verify_compiled(compiled, pipe, X, atol=1e-6):
+    """Check that the compiled pipeline gives the same probabilities as the original one."""
+    diff = np.abs(compiled.predict_proba(X) - pipe.predict_proba(X)).max()
+    if diff > atol:
+        raise ValueError(f"Compiled predictor differs from the original: max abs diff {diff:.2e}")
+    return diff
+
+
+def compile_tree_pipeline(pipe, X_check, atol=1e-6):
+    """Compile `pipe` and verify it against the original on the samples X_check.
+
+    Returns None if the model is not a supported tree ensemble, raises
+    ValueError if the compiled probabilities differ by more than `atol`.
+    """
+    if X_check is None or len(X_check) == 0:
+        raise ValueError("X_check is needed to verify the compiled predictor (e.g. the test split)")
+    if not hasattr(pipe, "named_steps") or set(pipe.named_steps) != {"preprocess", "model"}:
+        return None
+    try:
+        compiled = CompiledTreePipeline(pipe)
+    except ValueError:
+        return None
+    verify_compiled(compiled, pipe, X_check, atol)
+    return compiled